@@ -1,61 +1,116 @@
-import cv2
 import asyncio
-import base64
-import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
 import numpy as np
 from fastapi import FastAPI, WebSocket
-from ultralytics import YOLO
+from pipeline import get_model, get_video_source, send_frame, stream_frames
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 app = FastAPI()
 
 # --- CONFIGURATION ---
-BASE_DIR = os.path.dirname(os.path.abspath(__file__)).replace('\\', '/')
-VIDEO_PATH = os.path.join(BASE_DIR, "videos", "cctv.mp4").replace('\\', '/')
+BATCH_SIZE = 4         # Max frames per YOLO forward pass
 
-# Load Model
-print("Loading AI Model...")
-model = YOLO("yolov8n.pt")
+# Inference runs off the event loop on one worker; Ultralytics predictors
+# are not thread-safe, so connections queue up for the shared model here
+inference_executor = ThreadPoolExecutor(max_workers=1)
 
 # --- MANUAL TRACKER LOGIC (Verified Stable) ---
+MATCH_DIST2 = 45.0 ** 2 # Sensitivity of the follow (squared pixels)
+
+def _match_numpy(rects, cx, cy, thresh2):
+    """Vectorized fallback for `_match_kernel` when numba is unavailable."""
+    n = len(rects)
+    best = np.full(n, -1, dtype=np.int64)
+    if len(cx) == 0:
+        return best
+    px = rects[:, 0] + rects[:, 2] * 0.5
+    py = rects[:, 1] + rects[:, 3] * 0.5
+    # (N, K) squared distances between detections and tracked centers
+    d2 = (cx[None, :] - px[:, None]) ** 2 + (cy[None, :] - py[:, None]) ** 2
+    nearest = np.argmin(d2, axis=1)
+    matched = d2[np.arange(n), nearest] < thresh2
+    best[matched] = nearest[matched]
+    return best
+
+if njit is not None:
+    @njit('i8[:](f4[:,:], f4[:], f4[:], f4)', cache=True, fastmath=True)
+    def _match_kernel(rects, cx, cy, thresh2):
+        """Index of the nearest tracked center within `thresh2` per rect, -1 if none."""
+        n = rects.shape[0]
+        k = cx.shape[0]
+        best_idx = np.full(n, -1, np.int64)
+        for i in range(n):
+            px = rects[i, 0] + rects[i, 2] * np.float32(0.5)
+            py = rects[i, 1] + rects[i, 3] * np.float32(0.5)
+            best = -1
+            bestd = thresh2
+            for j in range(k):
+                dx = cx[j] - px
+                dy = cy[j] - py
+                d = dx * dx + dy * dy
+                if d < bestd:
+                    bestd = d
+                    best = j
+            best_idx[i] = best
+        return best_idx
+else:
+    _match_kernel = _match_numpy
+
 class SimpleTracker:
-    def __init__(self):
-        self.center_points = {}
+    def __init__(self, capacity=64):
         self.id_count = 0
-        self.scores = {} # Track suspicion scores per ID
+        # Tracked objects as parallel arrays, only the first `count` slots are live
+        self.count = 0
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.cx = np.empty(capacity, dtype=np.float32)
+        self.cy = np.empty(capacity, dtype=np.float32)
+        self.scores = np.empty(capacity, dtype=np.float32) # Suspicion score per object
+
+    def _reserve(self, size):
+        if size <= len(self.ids):
+            return
+        capacity = max(size, 2 * len(self.ids))
+        self.ids = np.resize(self.ids, capacity)
+        self.cx = np.resize(self.cx, capacity)
+        self.cy = np.resize(self.cy, capacity)
+        self.scores = np.resize(self.scores, capacity)
 
     def update(self, rects):
-        objects_bbs_ids = []
-        for rect in rects:
-            x, y, w, h = rect
-            cx = (x + x + w) // 2
-            cy = (y + y + h) // 2
-
-            same_object_detected = False
-            for id, pt in self.center_points.items():
-                dist = np.hypot(cx - pt[0], cy - pt[1])
-                if dist < 45: # Sensitivity of the follow
-                    self.center_points[id] = (cx, cy)
-                    # Increase suspicion score slowly (0.2 per frame)
-                    self.scores[id] = round(min(100, self.scores.get(id, 10.0) + 0.2), 1)
-                    
-                    objects_bbs_ids.append({
-                        "box": [x, y, x + w, y + h],
-                        "id": id,
-                        "score": self.scores[id]
-                    })
-                    same_object_detected = True
-                    break
-
-            if not same_object_detected:
-                self.center_points[self.id_count] = (cx, cy)
-                self.scores[self.id_count] = 10.0
-                objects_bbs_ids.append({
-                    "box": [x, y, x + w, y + h],
-                    "id": self.id_count,
-                    "score": 10.0
-                })
-                self.id_count += 1
-        return objects_bbs_ids
+        if len(rects) == 0:
+            return []
+
+        rects_np = np.asarray(rects, dtype=np.float32).reshape(-1, 4)
+        k = self.count
+        slots = _match_kernel(rects_np, self.cx[:k], self.cy[:k], MATCH_DIST2)
+
+        # Increase suspicion score slowly (0.2 per frame), once per matched object
+        matched = np.unique(slots[slots >= 0])
+        self.scores[matched] = np.minimum(np.round(self.scores[matched] + 0.2, 1), 100.0)
+
+        # Unmatched detections become new objects
+        new = slots < 0
+        new_count = int(new.sum())
+        self._reserve(k + new_count)
+        slots[new] = np.arange(k, k + new_count)
+        self.ids[k:k + new_count] = np.arange(self.id_count, self.id_count + new_count)
+        self.scores[k:k + new_count] = 10.0
+        self.count += new_count
+        self.id_count += new_count
+
+        self.cx[slots] = rects_np[:, 0] + rects_np[:, 2] * 0.5
+        self.cy[slots] = rects_np[:, 1] + rects_np[:, 3] * 0.5
+
+        boxes = rects_np.astype(int)
+        boxes[:, 2:] += boxes[:, :2]
+        return [
+            {"box": box, "id": id, "score": round(score, 1)}
+            for box, id, score in zip(boxes.tolist(), self.ids[slots].tolist(), self.scores[slots].tolist())
+        ]
 
 tracker = SimpleTracker()
 
@@ -65,50 +120,38 @@ async def websocket_endpoint(websocket: WebSocket):
     print("🚀 WebSocket Connected & Tracking Active")
     
     # Check if video file exists, otherwise use webcam
-    source = VIDEO_PATH if os.path.exists(VIDEO_PATH) else 0
-    cap = cv2.VideoCapture(source)
+    source = get_video_source()
+    model = get_model("detect")
     
     try:
-        while True:
-            success, frame = cap.read()
-            if not success:
-                if source != 0:
-                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                    continue
-                break
-
-            # 1. AI Detection
-            results = model(frame, stream=True, classes=[0], conf=0.4, verbose=False)
-            
-            raw_rects = []
-            for r in results:
-                boxes = r.boxes.xywh.cpu().numpy()
-                for box in boxes:
-                    x, y, w, h = box
-                    raw_rects.append([int(x - w/2), int(y - h/2), int(w), int(h)])
-
-            # 2. Manual Tracking
-            detections = tracker.update(raw_rects)
-
-            # 3. Base64 Encoding
-            _, buffer = cv2.imencode('.jpg', frame)
-            img_str = base64.b64encode(buffer).decode('utf-8')
-
-            # 4. Send to Frontend
-            await websocket.send_json({
-                "image": img_str,
-                "detections": detections
-            })
-            
-            # Sync to ~30 FPS
-            await asyncio.sleep(0.03)
+        async with aclosing(stream_frames(source, BATCH_SIZE)) as batches:
+            async for frames in batches:
+                # 1. AI Detection (one forward pass for the whole batch)
+                results = await asyncio.get_running_loop().run_in_executor(
+                    inference_executor, lambda: model(frames, classes=[0], conf=0.4, verbose=False)
+                )
+
+                for frame, r in zip(frames, results):
+                    # Center -> top-left on the device, one int32 copy to host
+                    rects = r.boxes.xywh.clone()
+                    rects[:, :2] -= rects[:, 2:] * 0.5
+                    raw_rects = rects.int().cpu().numpy()
+
+                    # 2. Manual Tracking (per frame, in capture order)
+                    detections = tracker.update(raw_rects)
+
+                    # 3. Send to Frontend (detections as text, frame as raw JPEG)
+                    await send_frame(websocket, frame, detections)
+
+                    # Sync to ~30 FPS
+                    await asyncio.sleep(0.03)
 
     except Exception as e:
         print(f"❌ WebSocket Error: {e}")
     finally:
-        cap.release()
         print("🔒 Connection Closed")
 
 if __name__ == "__main__":
     import uvicorn
+    # uvicorn's "auto" defaults pick uvloop and httptools whenever they are installed
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,223 @@
+"""Shared video pipeline for the WebSocket streamers (main.py and one.py).
+
+Holds the single YOLO model instance, video decoding and frame delivery so
+both endpoints reuse the same code and GPU context.
+"""
+import cv2
+import asyncio
+import os
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from ultralytics import YOLO
+
+# --- CONFIGURATION ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__)).replace('\\', '/')
+VIDEO_PATH = os.path.join(BASE_DIR, "videos", "cctv.mp4").replace('\\', '/')
+# Model files live in the backend folder, where export_engine.py writes the engine
+MODEL_DIR = os.path.dirname(BASE_DIR)
+ENGINE_PATH = os.path.join(MODEL_DIR, "yolov8n.engine").replace('\\', '/')
+WEIGHTS_PATH = os.path.join(MODEL_DIR, "yolov8n.pt").replace('\\', '/')
+# Prefer the TensorRT engine built by export_engine.py, fall back to PyTorch weights.
+# Set MODEL_PATH to serve another model, e.g. a pruned and fine-tuned export.
+MODEL_PATH = os.getenv("MODEL_PATH") or (ENGINE_PATH if os.path.exists(ENGINE_PATH) else WEIGHTS_PATH)
+BATCH_TIMEOUT = 0.01   # Max seconds to wait for a batch to fill up
+MAX_FRAME_HEIGHT = 720 # Taller frames are downscaled before inference/encoding
+JPEG_QUALITY = 80      # OpenCV defaults to 95; 80 roughly halves the payload
+
+@functools.lru_cache(maxsize=2)
+def get_model(role, /):
+    """Load the detector once per role ("detect" or "track"), on first use.
+
+    `role` is required and positional-only so every call hits the same
+    lru_cache entry.
+
+    "detect" is shared by plain (batched) inference. "track" gets its own
+    instance because model.track() registers BYTETracker callbacks on the
+    model, which would otherwise also run on every "detect" prediction.
+    """
+    print(f"Loading AI Model ({MODEL_PATH}, {role})...")
+    return YOLO(MODEL_PATH, task="detect")
+
+def get_video_source(path=VIDEO_PATH):
+    if os.path.exists(path):
+        print(f"✅ Video file found at: {path}")
+        return path
+    else:
+        print(f"⚠️ Video file NOT found. Falling back to WEBCAM (0)")
+        return 0
+
+# --- VIDEO DECODING ---
+def _scaled_size(width, height):
+    """(width, height) scaled down to MAX_FRAME_HEIGHT, keeping the aspect ratio."""
+    return round(width * MAX_FRAME_HEIGHT / height), MAX_FRAME_HEIGHT
+
+class VideoReader:
+    """Frame source that decodes on the GPU (NVDEC) when OpenCV has CUDA support.
+
+    Falls back to cv2.VideoCapture with FFmpeg hardware acceleration requested,
+    which OpenCV silently downgrades to CPU decode when none is available.
+    """
+    def __init__(self, source):
+        self.source = source
+        self.is_file = isinstance(source, str)
+        self.gpu_reader = None
+        self.cap = None
+        if self.is_file and hasattr(cv2, "cudacodec"):
+            try:
+                self.gpu_reader = cv2.cudacodec.createVideoReader(source)
+                print("⚡ Decoding video on GPU (NVDEC)")
+            except cv2.error:
+                self.gpu_reader = None
+        if self.gpu_reader is None:
+            if self.is_file:
+                self.cap = cv2.VideoCapture(source, cv2.CAP_FFMPEG, [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+            else:
+                self.cap = cv2.VideoCapture(source)
+
+    def isOpened(self):
+        return self.gpu_reader is not None or self.cap.isOpened()
+
+    def read(self):
+        """Next BGR frame in host memory, or None when the source is exhausted."""
+        if self.gpu_reader is not None:
+            success, gpu_frame = self.gpu_reader.nextFrame()
+            if not success:
+                return None
+            if gpu_frame.channels() == 4:
+                gpu_frame = cv2.cuda.cvtColor(gpu_frame, cv2.COLOR_BGRA2BGR)
+            width, height = gpu_frame.size()
+            if height > MAX_FRAME_HEIGHT:
+                gpu_frame = cv2.cuda.resize(gpu_frame, _scaled_size(width, height), interpolation=cv2.INTER_AREA)
+            # YOLO preprocessing runs on host arrays, so download once here
+            return gpu_frame.download()
+        success, frame = self.cap.read()
+        if not success:
+            return None
+        height, width = frame.shape[:2]
+        if height > MAX_FRAME_HEIGHT:
+            frame = cv2.resize(frame, _scaled_size(width, height), interpolation=cv2.INTER_AREA)
+        return frame
+
+    def rewind(self):
+        if self.gpu_reader is not None:
+            # NVDEC readers cannot seek, reopen instead
+            self.gpu_reader = cv2.cudacodec.createVideoReader(self.source)
+        else:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+        self.gpu_reader = None
+
+# --- FRAME DELIVERY ---
+class VideoSourceError(RuntimeError):
+    """Raised by stream_frames when the video source cannot be opened."""
+
+def read_frame(reader):
+    """Blocking read of the next frame, looping video files.
+
+    Returns (frame, rewound); frame is None when the source ends.
+    """
+    frame = reader.read()
+    if frame is None and reader.is_file:
+        reader.rewind()
+        return reader.read(), True
+    return frame, False
+
+_END = object()    # Queue marker: the source ran out of frames
+_REWIND = object() # Queue marker: the video file looped back to the start
+
+async def capture_frames(reader, queue, executor):
+    """Producer: decode frames on a worker thread and push them into the queue.
+
+    Puts _REWIND before the first frame of each new pass over a video file,
+    and always finishes with a marker: _END when the source runs out, or the
+    exception that stopped decoding so the consumer can re-raise it.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            frame, rewound = await loop.run_in_executor(executor, read_frame, reader)
+            if rewound:
+                await queue.put(_REWIND)
+            if frame is None:
+                await queue.put(_END)
+                break
+            await queue.put(frame)
+    except Exception as e:
+        await queue.put(e)
+
+def _is_marker(item):
+    return item is _END or item is _REWIND or isinstance(item, Exception)
+
+async def next_batch(queue, batch_size):
+    """Wait for one frame, then collect up to `batch_size` within BATCH_TIMEOUT.
+
+    Returns (frames, marker); marker is the queue marker that cut the batch
+    short, or None.
+    """
+    loop = asyncio.get_running_loop()
+    frames = []
+    item = await queue.get()
+    # One deadline for the whole batch, counted from the first frame
+    deadline = loop.time() + BATCH_TIMEOUT
+    while not _is_marker(item):
+        frames.append(item)
+        if len(frames) == batch_size:
+            return frames, None
+        try:
+            item = await asyncio.wait_for(queue.get(), max(0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            return frames, None
+    return frames, item
+
+async def stream_frames(source, batch_size=1, on_rewind=None):
+    """Yield lists of up to `batch_size` frames, decoded on a background thread.
+
+    Video files loop forever, calling `on_rewind` on the consumer's side
+    between the last frame and the first frame of the new pass. A webcam stops
+    when it runs out of frames. Raises VideoSourceError if the source cannot
+    be opened; decoder errors are re-raised here. Use with
+    contextlib.aclosing so the capture thread and decoder are released when
+    the consumer stops.
+    """
+    reader = VideoReader(source)
+    if not reader.isOpened():
+        reader.release()
+        raise VideoSourceError("Could not open any video source.")
+
+    # Single capture thread so reads and the final release never overlap
+    executor = ThreadPoolExecutor(max_workers=1)
+    queue = asyncio.Queue(maxsize=2 * batch_size)
+    producer = asyncio.create_task(capture_frames(reader, queue, executor))
+    try:
+        while True:
+            frames, marker = await next_batch(queue, batch_size)
+            if frames:
+                yield frames
+            if marker is _END:
+                break
+            if marker is _REWIND:
+                if on_rewind is not None:
+                    on_rewind()
+            elif marker is not None:
+                raise marker
+    finally:
+        producer.cancel()
+        # Retrieve the producer's outcome so nothing is left unobserved
+        await asyncio.gather(producer, return_exceptions=True)
+        await asyncio.get_running_loop().run_in_executor(executor, reader.release)
+        executor.shutdown(wait=False)
+
+def encode_frame(frame):
+    """JPEG-encode a frame into raw bytes for a binary WebSocket message."""
+    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    return buffer.tobytes()
+
+async def send_frame(websocket, frame, detections):
+    """Send detections as a text message followed by the JPEG as binary."""
+    # Encode off the event loop; OpenCV releases the GIL while it works
+    payload = await asyncio.to_thread(encode_frame, frame)
+    await websocket.send_json({"detections": detections})
+    await websocket.send_bytes(payload)
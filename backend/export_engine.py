@@ -0,0 +1,68 @@
+"""One-time export of yolov8n.pt to a TensorRT engine for the streamers.
+
+Run from the backend folder (needs an NVIDIA GPU with TensorRT installed):
+
+    python export_engine.py            # FP16 engine, dynamic batch up to 4
+    python export_engine.py --int8     # INT8 engine, calibrated on CCTV frames
+
+The streamers pick up `yolov8n.engine` automatically when it exists. Pass
+--weights to export a different checkpoint (e.g. a pruned, fine-tuned model)
+and point the MODEL_PATH environment variable at the resulting engine.
+"""
+import argparse
+import os
+
+import cv2
+from ultralytics import YOLO
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__)).replace('\\', '/')
+VIDEO_PATH = os.path.join(BASE_DIR, "app", "videos", "cctv.mp4").replace('\\', '/')
+CALIB_DIR = os.path.join(BASE_DIR, "calib").replace('\\', '/')
+
+
+def build_calibration_set(num_frames=200):
+    """Dump evenly spaced frames from the CCTV clip for INT8 calibration."""
+    cap = cv2.VideoCapture(VIDEO_PATH)
+    if not cap.isOpened():
+        raise SystemExit(f"❌ Cannot build INT8 calibration set: could not open {VIDEO_PATH}")
+
+    images_dir = os.path.join(CALIB_DIR, "images")
+    os.makedirs(images_dir, exist_ok=True)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or num_frames
+    step = max(1, total // num_frames)
+    saved = 0
+    for idx in range(0, total, step):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+        success, frame = cap.read()
+        if not success:
+            break
+        cv2.imwrite(os.path.join(images_dir, f"{saved:04d}.jpg"), frame)
+        saved += 1
+    cap.release()
+    if saved == 0:
+        raise SystemExit(f"❌ Cannot build INT8 calibration set: no frames could be read from {VIDEO_PATH}")
+    print(f"Saved {saved} calibration frames to {images_dir}")
+
+    data_yaml = os.path.join(CALIB_DIR, "calib.yaml")
+    with open(data_yaml, "w") as f:
+        f.write(f"path: {CALIB_DIR}\ntrain: images\nval: images\nnames:\n  0: person\n")
+    return data_yaml
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", default=os.path.join(BASE_DIR, "yolov8n.pt"), help="PyTorch checkpoint to export")
+    parser.add_argument("--int8", action="store_true", help="build an INT8 engine instead of FP16")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--batch", type=int, default=4, help="max batch size (matches BATCH_SIZE in app/main.py)")
+    parser.add_argument("--workspace", type=int, default=4, help="TensorRT workspace in GiB")
+    args = parser.parse_args()
+
+    export_args = dict(format="engine", imgsz=args.imgsz, batch=args.batch, dynamic=True, workspace=args.workspace)
+    if args.int8:
+        export_args.update(int8=True, data=build_calibration_set())
+    else:
+        export_args.update(half=True)
+
+    path = YOLO(args.weights).export(**export_args)
+    print(f"✅ Engine written to: {path}")
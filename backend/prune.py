@@ -0,0 +1,138 @@
+"""Offline structured pruning + fine-tuning of yolov8n for the person-only streamers.
+
+Run from the backend folder (needs `pip install torch-pruning` and a GPU for
+the fine-tune):
+
+    python prune.py --data coco.yaml                  # prune 40% of channels, fine-tune 10 epochs
+    python prune.py --data coco.yaml --epochs 0       # prune only, no fine-tune
+    python export_engine.py --weights <printed .pt>   # then build the TensorRT engine
+
+`--data` must keep COCO's 80 class ids (e.g. coco.yaml or a person-only
+subset of it): the Detect head is left unpruned, so its class count must not
+change. Point MODEL_PATH at the resulting engine to serve it.
+
+The pruned checkpoint pickles C2fSplit from this module, so load it with the
+backend folder on sys.path (export_engine.py run from backend/ does).
+"""
+import argparse
+import os
+from copy import deepcopy
+
+import torch
+import torch.nn as nn
+import torch_pruning as tp
+from ultralytics import YOLO
+from ultralytics.models.yolo.detect import DetectionTrainer
+from ultralytics.nn.modules import C2f, Conv, Detect
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__)).replace('\\', '/')
+CH_SPARSITY = 0.4  # Fraction of channels removed per prunable layer
+
+
+class C2fSplit(nn.Module):
+    """C2f with cv1 split into two convs, so no tensor.chunk() sits in the graph.
+
+    torch-pruning cannot keep the two halves of a chunked conv output coupled,
+    so cv1's output channels are copied into cv0/cv1 which prune independently.
+    """
+    def __init__(self, c2f):
+        super().__init__()
+        half = c2f.c
+        c1 = c2f.cv1.conv.in_channels
+        self.cv0 = Conv(c1, half, 1, 1)
+        self.cv1 = Conv(c1, half, 1, 1)
+        with torch.no_grad():
+            for dst, sl in ((self.cv0, slice(0, half)), (self.cv1, slice(half, 2 * half))):
+                dst.conv.weight.copy_(c2f.cv1.conv.weight[sl])
+                for key in ("weight", "bias", "running_mean", "running_var"):
+                    getattr(dst.bn, key).copy_(getattr(c2f.cv1.bn, key)[sl])
+                dst.bn.eps = c2f.cv1.bn.eps
+                dst.bn.momentum = c2f.cv1.bn.momentum
+        self.cv2 = c2f.cv2
+        self.m = c2f.m
+        # Routing attributes used by DetectionModel's forward
+        for attr in ("i", "f", "type", "np"):
+            if hasattr(c2f, attr):
+                setattr(self, attr, getattr(c2f, attr))
+
+    def forward(self, x):
+        y = [self.cv0(x), self.cv1(x)]
+        y.extend(m(y[-1]) for m in self.m)
+        return self.cv2(torch.cat(y, 1))
+
+
+def split_c2f(module):
+    """Recursively swap every C2f block for an equivalent C2fSplit."""
+    for name, child in module.named_children():
+        if isinstance(child, C2f):
+            setattr(module, name, C2fSplit(child))
+        else:
+            split_c2f(child)
+
+
+def prune(model, imgsz, ch_sparsity):
+    """Magnitude-prune `ch_sparsity` of the backbone/neck channels in place."""
+    split_c2f(model)
+    model.train()
+    for p in model.parameters():
+        p.requires_grad = True
+
+    example_inputs = torch.randn(1, 3, imgsz, imgsz)
+    # The dependency graph ties together channels that must be removed as a
+    # group (residual adds, concats, BN after conv)
+    DG = tp.DependencyGraph().build_dependency(model, example_inputs=example_inputs)
+    print(f"Dependency graph built over {len(DG.module2node)} modules")
+
+    base_macs, base_params = tp.utils.count_ops_and_params(model, example_inputs)
+    pruner = tp.pruner.MagnitudePruner(
+        model,
+        example_inputs,
+        importance=tp.importance.MagnitudeImportance(p=2),
+        pruning_ratio=ch_sparsity,  # named ch_sparsity before torch-pruning 1.3
+        ignored_layers=[m for m in model.modules() if isinstance(m, Detect)],
+    )
+    pruner.step()
+    macs, params = tp.utils.count_ops_and_params(model, example_inputs)
+    print(f"✂️ Params {base_params / 1e6:.2f}M -> {params / 1e6:.2f}M, MACs {base_macs / 1e9:.2f}G -> {macs / 1e9:.2f}G")
+    return model
+
+
+def fine_tune(model, weights, data, epochs, imgsz):
+    """Fine-tune the pruned module itself and return the best checkpoint path.
+
+    YOLO.train() rebuilds the network from model.yaml, which would restore the
+    original channel counts. Handing the module to DetectionTrainer directly
+    avoids that: setup_model() skips rebuilding when trainer.model is already
+    an nn.Module.
+    """
+    trainer = DetectionTrainer(overrides=dict(model=weights, data=data, epochs=epochs, imgsz=imgsz, name="yolov8n-pruned"))
+    trainer.model = model
+    trainer.train()
+    return trainer.best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", default=os.path.join(BASE_DIR, "yolov8n.pt"), help="checkpoint to prune")
+    parser.add_argument("--data", required=True, help="dataset yaml for fine-tuning (COCO class ids)")
+    parser.add_argument("--ch-sparsity", type=float, default=CH_SPARSITY)
+    parser.add_argument("--epochs", type=int, default=10, help="fine-tune epochs, 0 to skip")
+    parser.add_argument("--imgsz", type=int, default=640)
+    args = parser.parse_args()
+
+    model = prune(YOLO(args.weights).model.float().cpu(), args.imgsz, args.ch_sparsity)
+
+    pruned_path = os.path.join(BASE_DIR, "yolov8n-pruned.pt")
+    torch.save({"model": deepcopy(model).half(), "train_args": {}}, pruned_path)
+    print(f"✅ Pruned (not fine-tuned) checkpoint written to: {pruned_path}")
+
+    if args.epochs > 0:
+        best = fine_tune(model, args.weights, args.data, args.epochs, args.imgsz)
+        print(f"✅ Fine-tuned checkpoint written to: {best}")
+
+
+if __name__ == "__main__":
+    # Run through the importable module so pickled checkpoints reference
+    # prune.C2fSplit rather than __main__.C2fSplit
+    import prune as _self
+    _self.main()
@@ -13,15 +13,28 @@ export const VideoCanvas = ({ id, streamUrl, title }) => {
     ws.onopen = () => setStatus("LIVE");
     ws.onclose = () => setStatus("OFFLINE");
     
+    // Each frame arrives as a JSON text message with the detections,
+    // followed by a binary message holding the raw JPEG
+    let latest = { detections: [] };
+
     ws.onmessage = (event) => {
-      const data = JSON.parse(event.data);
+      if (typeof event.data === "string") {
+        latest = JSON.parse(event.data);
+        return;
+      }
+      const data = latest;
       const canvas = canvasRef.current;
       if (!canvas) return;
       const ctx = canvas.getContext('2d');
       const img = new Image();
-      
-      img.src = `data:image/jpeg;base64,${data.image}`;
+      const url = URL.createObjectURL(event.data);
+
+      img.src = url;
+      // Frames that fail to decode must release their Blob URL too
+      img.onerror = () => URL.revokeObjectURL(url);
       img.onload = () => {
+        URL.revokeObjectURL(url);
+
         // --- CRITICAL FIX 1: MATCHING INTERNAL RESOLUTION ---
         // If we don't do this, the "brush" is drawing on a different scale than the image
         canvas.width = img.width;